@@ -1,140 +1,982 @@
-import React, { useState, useRef, useEffect } from 'react';
+import React, { useState, useRef, useEffect, useCallback, useMemo, useContext } from 'react';
+// Requires react-window 1.x; VariableSizeList and areEqual were removed in 2.0.
+import { VariableSizeList, areEqual } from 'react-window';
+import { encodeImage, pcmToWav, pcmToFloat32 } from './media.js';
 
-// Main component for the advanced Gemini-powered chatbot.
-export default function App() {
-    // State to hold the conversation history.
-    const [messages, setMessages] = useState([
-        { role: 'model', content: "Hello! I'm an advanced chatbot powered by Gemini. You can chat, upload images, or generate creative content with me.", type: 'text' }
-    ]);
+// Gemini API configuration. The key is supplied at build time rather than inlined in the source.
+const API_KEY = import.meta.env.VITE_GEMINI_KEY || '';
+const FLASH_API_URL = `https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-preview-05-20:generateContent?key=${API_KEY}`;
+const FLASH_STREAM_API_URL = `https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-preview-05-20:streamGenerateContent?alt=sse&key=${API_KEY}`;
+const TTS_API_URL = `https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-preview-tts:generateContent?key=${API_KEY}`;
+
+// Lookup table from base64 character code to its 6-bit value.
+const BASE64_LOOKUP = new Uint8Array(128);
+'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/'.split('').forEach((c, i) => {
+    BASE64_LOOKUP[c.charCodeAt(0)] = i;
+});
+
+// Helper function for TTS audio decoding (base64 to raw PCM bytes)
+function base64ToArrayBuffer(base64) {
+    if (typeof Uint8Array.fromBase64 === 'function') {
+        return Uint8Array.fromBase64(base64).buffer;
+    }
+    let len = base64.length;
+    while (len > 0 && base64.charCodeAt(len - 1) === 61) len--; // strip '=' padding
+    const bytes = new Uint8Array((len * 3) >> 2);
+    let i = 0;
+    let j = 0;
+    // Decode 4 characters into 3 bytes per iteration.
+    for (; i + 4 <= len; i += 4) {
+        const n = (BASE64_LOOKUP[base64.charCodeAt(i)] << 18) |
+            (BASE64_LOOKUP[base64.charCodeAt(i + 1)] << 12) |
+            (BASE64_LOOKUP[base64.charCodeAt(i + 2)] << 6) |
+            BASE64_LOOKUP[base64.charCodeAt(i + 3)];
+        bytes[j++] = n >> 16;
+        bytes[j++] = (n >> 8) & 0xff;
+        bytes[j++] = n & 0xff;
+    }
+    // Trailing group of 2 or 3 characters (1 or 2 bytes).
+    const rest = len - i;
+    if (rest >= 2) {
+        const n = (BASE64_LOOKUP[base64.charCodeAt(i)] << 18) |
+            (BASE64_LOOKUP[base64.charCodeAt(i + 1)] << 12) |
+            (rest === 3 ? BASE64_LOOKUP[base64.charCodeAt(i + 2)] << 6 : 0);
+        bytes[j++] = n >> 16;
+        if (rest === 3) bytes[j++] = (n >> 8) & 0xff;
+    }
+    return bytes.buffer;
+}
+
+// Helper to lazily start the shared media worker. Jobs are posted with an id
+// and resolve when the worker replies; transferred buffers are not copied.
+let mediaWorker = null;
+function getMediaWorker() {
+    if (!mediaWorker) {
+        const worker = new Worker(new URL('./media.worker.js', import.meta.url), { type: 'module' });
+        const pending = new Map();
+        let nextId = 0;
+        worker.onmessage = ({ data }) => {
+            const job = pending.get(data.id);
+            pending.delete(data.id);
+            if (data.error) job.reject(new Error(data.error));
+            else job.resolve(data.result);
+        };
+        // A worker that fails to load (or crashes) never replies, so drop it and
+        // let the next job start a fresh one.
+        worker.onerror = (event) => {
+            pending.forEach(job => job.reject(new Error(event.message || "Media worker failed")));
+            pending.clear();
+            worker.terminate();
+            if (mediaWorker === handle) mediaWorker = null;
+        };
+        const handle = {
+            run(job, transfer = []) {
+                return new Promise((resolve, reject) => {
+                    const id = nextId++;
+                    pending.set(id, { resolve, reject });
+                    worker.postMessage({ ...job, id }, transfer);
+                });
+            }
+        };
+        mediaWorker = handle;
+    }
+    return mediaWorker;
+}
+
+// Web Audio constructor, if the browser has one; otherwise TTS falls back to a WAV <audio> source.
+const AudioContextClass = typeof window !== 'undefined' ? (window.AudioContext || window.webkitAudioContext) : undefined;
+
+// Helper to start playback of an audio URL on the given element.
+function playAudio(audio, audioUrl) {
+    if (audio) {
+        audio.src = audioUrl;
+        audio.play().catch(e => console.error("Autoplay failed:", e));
+    }
+}
+
+// Helper to prepare an image file for the API in the media worker, falling back
+// to the main thread where the worker has no canvas. The original file is kept for the preview.
+async function prepareImage(file) {
+    let encoded;
+    try {
+        encoded = await getMediaWorker().run({ type: 'encodeImage', file });
+    } catch (error) {
+        encoded = await encodeImage(file);
+    }
+    return { data: encoded.data, mimeType: encoded.mimeType, url: URL.createObjectURL(file), blob: file };
+}
+
+// Helper to convert TTS audio in the media worker, falling back to the main
+// thread if the worker fails. The PCM is decoded again for the fallback, since
+// the buffer handed to the worker is transferred and no longer usable here.
+async function convertTtsAudio(type, audioData, sampleRate) {
+    const pcmData = base64ToArrayBuffer(audioData);
+    try {
+        return await getMediaWorker().run({ type, pcmBuffer: pcmData, sampleRate }, [pcmData]);
+    } catch (error) {
+        const pcmBuffer = base64ToArrayBuffer(audioData);
+        return type === 'pcmToFloat32' ? pcmToFloat32(pcmBuffer) : pcmToWav(pcmBuffer, sampleRate);
+    }
+}
+
+// Helper to synthesize speech for a message. Returns an AudioBuffer for the
+// given audio context, a WAV object URL without one, or null if no audio came back.
+async function synthesizeSpeech(text, audioContext) {
+    const payload = {
+        contents: [{ parts: [{ text: text }] }],
+        generationConfig: {
+            responseModalities: ["AUDIO"],
+            speechConfig: { voiceConfig: { prebuiltVoiceConfig: { voiceName: "Zephyr" } } }
+        },
+        model: "gemini-2.5-flash-preview-tts"
+    };
+    const response = await fetch(TTS_API_URL, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(payload)
+    });
+
+    if (!response.ok) throw new Error(`API Error: ${response.statusText}`);
+    const result = await response.json();
+    const part = result?.candidates?.[0]?.content?.parts?.[0];
+    const audioData = part?.inlineData?.data;
+    if (!audioData) return null;
+    const sampleRate = 16000; // The sample rate for Gemini TTS model
+    if (audioContext) {
+        // Play the samples directly; the context resamples the 16 kHz buffer to its own rate.
+        const samples = await convertTtsAudio('pcmToFloat32', audioData, sampleRate);
+        const clip = audioContext.createBuffer(1, samples.length, sampleRate);
+        clip.getChannelData(0).set(samples);
+        return clip;
+    }
+    const wavBlob = await convertTtsAudio('pcmToWav', audioData, sampleRate);
+    return URL.createObjectURL(wavBlob);
+}
+
+// Helper to read a server-sent events response, yielding each parsed JSON data payload.
+// Lines are found with indexOf rather than a regex so large payloads are scanned once.
+async function* readSseEvents(response) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder('utf-8');
+    let buffer = '';
+    let data = '';
+    while (true) {
+        const { done, value } = await reader.read();
+        // At the end, flush the decoder and terminate any final line left without a newline.
+        buffer += done ? decoder.decode() + '\n' : decoder.decode(value, { stream: true });
+        let start = 0;
+        let newline;
+        while ((newline = buffer.indexOf('\n', start)) !== -1) {
+            let end = newline;
+            if (end > start && buffer.charCodeAt(end - 1) === 13) end--; // strip '\r'
+            if (end === start) {
+                // A blank line terminates the event.
+                if (data) yield JSON.parse(data);
+                data = '';
+            } else if (buffer.startsWith('data:', start)) {
+                const offset = buffer.charCodeAt(start + 5) === 32 ? start + 6 : start + 5;
+                data += (data ? '\n' : '') + buffer.slice(offset, end);
+            }
+            start = newline + 1;
+        }
+        buffer = buffer.slice(start);
+        if (done) break;
+    }
+    if (data) yield JSON.parse(data);
+}
+
+// Helpers for a small IndexedDB key-value store used to persist the chat.
+const DB_NAME = 'gemini-chatbot';
+const STORE_NAME = 'keyval';
+let dbPromise = null;
+
+function openDb() {
+    if (!dbPromise) {
+        dbPromise = new Promise((resolve, reject) => {
+            const request = indexedDB.open(DB_NAME, 1);
+            request.onupgradeneeded = () => request.result.createObjectStore(STORE_NAME);
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+    }
+    return dbPromise;
+}
+
+async function idbRequest(mode, operation) {
+    const db = await openDb();
+    return new Promise((resolve, reject) => {
+        const request = operation(db.transaction(STORE_NAME, mode).objectStore(STORE_NAME));
+        request.onsuccess = () => resolve(request.result);
+        request.onerror = () => reject(request.error);
+    });
+}
+
+function idbGet(key) {
+    return idbRequest('readonly', store => store.get(key));
+}
+
+function idbSet(key, value) {
+    return idbRequest('readwrite', store => store.put(value, key));
+}
+
+function idbDel(key) {
+    return idbRequest('readwrite', store => store.delete(key));
+}
+
+// Helper to write several keys in one transaction, so either all of them are saved or none are.
+async function idbSetMany(entries) {
+    const db = await openDb();
+    return new Promise((resolve, reject) => {
+        const transaction = db.transaction(STORE_NAME, 'readwrite');
+        const store = transaction.objectStore(STORE_NAME);
+        entries.forEach(([key, value]) => store.put(value, key));
+        transaction.oncomplete = () => resolve();
+        transaction.onabort = () => reject(transaction.error);
+    });
+}
+
+// Helper to shape a message for storage: images are kept as Blobs rather than
+// base64 or object URLs, which don't survive a reload.
+function toStoredMessage(msg) {
+    if (!msg.image) return msg;
+    return { ...msg, image: { mimeType: msg.image.mimeType, blob: msg.image.blob } };
+}
+
+// Helper to turn a stored message back into one that can be rendered.
+// Messages saved before ids were introduced are given one.
+function fromStoredMessage(msg) {
+    const restored = msg.id ? msg : { ...msg, id: crypto.randomUUID() };
+    if (!restored.image) return restored;
+    return { ...restored, image: { ...restored.image, url: URL.createObjectURL(restored.image.blob) } };
+}
+
+// Most messages kept in the live conversation; older ones are moved to the
+// IndexedDB archive in pages of ARCHIVE_PAGE_SIZE.
+const MAX_MESSAGES = 200;
+const ARCHIVE_PAGE_SIZE = 50;
+
+// Text sent in place of an image that is no longer attached to the request.
+const IMAGE_PLACEHOLDER = '[image omitted]';
+
+// Helper to shape a message as a Gemini API content entry. The API is stateless,
+// so every request carries the history; to keep that small, images are replaced
+// with a placeholder here and only the most recent one is re-attached when sending.
+// Recipes are passed back as JSON.
+function toApiContent(msg) {
+    const parts = [{ text: msg.type === 'recipe' ? JSON.stringify(msg.content) : msg.content }];
+    if (msg.image) parts.push({ text: IMAGE_PLACEHOLDER });
+    return {
+        role: msg.role === 'model' ? 'model' : 'user',
+        parts
+    };
+}
+
+// Delay before the conversation is written to IndexedDB after a change.
+const PERSIST_DELAY_MS = 500;
+
+// Most synthesized clips kept for replay; the least recently played is dropped first.
+const TTS_CACHE_SIZE = 20;
+
+// Helper to free a cached TTS clip. WAV clips are object URLs that must be revoked;
+// AudioBuffers are left to the garbage collector.
+function releaseClip(clip) {
+    if (typeof clip === 'string') URL.revokeObjectURL(clip);
+}
+
+// The greeting shown at the start of every conversation.
+const GREETING_MESSAGE = { id: 'greeting', role: 'model', content: "Hello! I'm an advanced chatbot powered by Gemini. You can chat, upload images, or generate creative content with me.", type: 'text' };
+
+// Component to render a recipe card.
+const RecipeCard = React.memo(function RecipeCard({ recipe }) {
+    return (
+        <div className="bg-gray-700 p-4 rounded-xl shadow-lg mt-2">
+            <h3 className="text-xl font-bold mb-2 text-white">{recipe.recipeName}</h3>
+            <h4 className="font-semibold text-gray-300">Ingredients:</h4>
+            <ul className="list-disc list-inside text-gray-400 mb-2">
+                {recipe.ingredients.map((item, i) => (
+                    <li key={`ing-${i}-${item.slice(0, 8)}`}>{item}</li>
+                ))}
+            </ul>
+            <h4 className="font-semibold text-gray-300">Instructions:</h4>
+            <ol className="list-decimal list-inside text-gray-400">
+                {recipe.instructions.map((step, i) => (
+                    <li key={`step-${i}-${step.slice(0, 8)}`}>{step}</li>
+                ))}
+            </ol>
+        </div>
+    );
+});
+
+// Only re-render a message row when what it displays has actually changed.
+function areMessagePropsEqual(prev, next) {
+    if (prev.onListen !== next.onListen) return false;
+    if (prev.msg === next.msg) return true;
+    return prev.msg.role === next.msg.role &&
+        prev.msg.type === next.msg.type &&
+        prev.msg.content === next.msg.content &&
+        prev.msg.image?.url === next.msg.image?.url;
+}
+
+// Component to render a single chat message.
+const ChatMessage = React.memo(function ChatMessage({ msg, onListen }) {
+    return (
+        <div className={`flex my-2 ${msg.role === 'user' ? 'justify-end' : 'justify-start'}`}>
+            {msg.role === 'user' ? (
+                <div className="flex flex-col items-end">
+                    <div className="p-4 rounded-xl max-w-3/4 shadow-lg bg-blue-600 rounded-br-none">
+                        {msg.content}
+                    </div>
+                    {msg.image && (
+                        <div className="mt-2 w-48 h-auto overflow-hidden rounded-lg shadow-md">
+                            <img src={msg.image.url} alt="User upload" className="w-full h-full object-cover" />
+                        </div>
+                    )}
+                </div>
+            ) : (
+                <div className="flex flex-col items-start">
+                    {msg.type === 'text' && (
+                        <div className="p-4 rounded-xl max-w-3/4 shadow-lg bg-gray-800 rounded-bl-none flex items-center">
+                            <span>{msg.content}</span>
+                            <button 
+                                onClick={() => onListen(msg.content)} 
+                                className="ml-4 p-2 rounded-full bg-gray-700 hover:bg-gray-600 transition-colors"
+                                title="Listen to this message"
+                            >
+                                <svg xmlns="http://www.w3.org/2000/svg" fill="currentColor" viewBox="0 0 24 24" className="w-5 h-5">
+                                    <path d="M3 9v6h4l5 5V4L7 9H3zm13.5 3c0-1.77-1-3.22-2.5-4v8c1.5-.78 2.5-2.23 2.5-4zM16 1.84v2.02c4.42 1.49 7 5.09 7 9.14s-2.58 7.65-7 9.14v2.02c5.52-1.55 9-6.31 9-11.16s-3.48-9.61-9-11.16z" />
+                                </svg>
+                            </button>
+                        </div>
+                    )}
+                    {msg.type === 'recipe' && <RecipeCard recipe={msg.content} />}
+                </div>
+            )}
+        </div>
+    );
+}, areMessagePropsEqual);
+
+// Height assumed for a message row until it has been measured.
+const ESTIMATED_ROW_HEIGHT = 80;
+
+// Component to render one virtualized row, reporting its measured height
+// back to the list so rows of any size can be windowed.
+const MessageRow = React.memo(function MessageRow({ index, style, data }) {
+    const { items, onListen, setRowHeight } = data;
+    const msg = items[index];
+    const rowRef = useRef(null);
+
+    // Re-measure whenever the content resizes (streamed text, images loading, window width).
+    useEffect(() => {
+        const row = rowRef.current;
+        const observer = new ResizeObserver(() => setRowHeight(msg.id, index, row.getBoundingClientRect().height));
+        observer.observe(row);
+        return () => observer.disconnect();
+    }, [msg.id, index, setRowHeight]);
+
+    return (
+        <div style={style}>
+            <div ref={rowRef} className="flow-root pr-2">
+                <ChatMessage msg={msg} onListen={onListen} />
+            </div>
+        </div>
+    );
+}, areEqual);
+
+// Helper giving each virtual row its message's id as the React key.
+function getMessageKey(index, data) {
+    return data.items[index].id;
+}
+
+// Context carrying the ref of the sentinel that marks the end of the list content.
+const BottomSentinelContext = React.createContext(null);
+
+// Inner element of the virtual list: the rows plus a 1px sentinel at the very
+// bottom, watched to tell whether the user is scrolled to the end.
+const MessageListInner = React.forwardRef(function MessageListInner({ children, style, ...rest }, ref) {
+    const bottomRef = useContext(BottomSentinelContext);
+    return (
+        <div ref={ref} style={{ ...style, position: 'relative' }} {...rest}>
+            {children}
+            <div ref={bottomRef} style={{ position: 'absolute', bottom: 0, height: 1, width: '100%' }} />
+        </div>
+    );
+});
+
+// Component to render the scrollable conversation. Only the rows in view are
+// mounted, so the DOM stays small however long the conversation gets.
+const MessageList = React.memo(function MessageList({ messages, olderMessages, hasOlder, isLoadingOlder, onShowOlder, isTyping, onListen }) {
+    // Reference to the list container, measured to size the virtual list.
+    const containerRef = useRef(null);
+    const [size, setSize] = useState({ width: 0, height: 0 });
+    // Reference to the virtual list for auto-scrolling and size resets.
+    const listRef = useRef(null);
+    // Measured row heights, by message id.
+    const rowHeightsRef = useRef(new Map());
+    // The list's scroll element and end-of-content sentinel, and whether that sentinel is in view.
+    const outerRef = useRef(null);
+    const bottomRef = useRef(null);
+    const atBottomRef = useRef(true);
+    const itemCountRef = useRef(0);
+
+    const items = useMemo(
+        () => (olderMessages.length ? [...olderMessages, ...messages] : messages),
+        [olderMessages, messages]
+    );
+
+    useEffect(() => {
+        const observer = new ResizeObserver(([entry]) => {
+            const { width, height } = entry.contentRect;
+            setSize({ width, height });
+        });
+        observer.observe(containerRef.current);
+        return () => observer.disconnect();
+    }, []);
+
+    // Function to keep the newest message in view, but only if the user hasn't scrolled up.
+    const scrollToEndIfAtBottom = useCallback(() => {
+        if (atBottomRef.current && itemCountRef.current > 0) {
+            listRef.current?.scrollToItem(itemCountRef.current - 1, 'end');
+        }
+    }, []);
+
+    const setRowHeight = useCallback((id, index, height) => {
+        if (rowHeightsRef.current.get(id) === height) return;
+        rowHeightsRef.current.set(id, height);
+        listRef.current?.resetAfterIndex(index);
+        // A growing last row (e.g. a streamed reply) would otherwise push the end out of view.
+        if (index === itemCountRef.current - 1) scrollToEndIfAtBottom();
+    }, [scrollToEndIfAtBottom]);
+
+    const getRowHeight = useCallback(
+        index => rowHeightsRef.current.get(items[index].id) || ESTIMATED_ROW_HEIGHT,
+        [items]
+    );
+
+    // Row offsets shift when history is paged in, trimmed or replaced. Heights are
+    // kept by id, so only the list's offsets need recomputing; forget rows that left.
+    const firstItem = items[0];
+    useEffect(() => {
+        const ids = new Set(items.map(msg => msg.id));
+        rowHeightsRef.current.forEach((height, id) => {
+            if (!ids.has(id)) rowHeightsRef.current.delete(id);
+        });
+        listRef.current?.resetAfterIndex(0);
+    }, [firstItem]);
+
+    // Track whether the end of the conversation is visible, without reading scroll geometry.
+    const isListMounted = size.height > 0;
+    useEffect(() => {
+        if (!isListMounted) return;
+        const observer = new IntersectionObserver(([entry]) => {
+            atBottomRef.current = entry.isIntersecting;
+        }, { root: outerRef.current, rootMargin: '0px 0px 8px 0px' });
+        observer.observe(bottomRef.current);
+        return () => observer.disconnect();
+    }, [isListMounted]);
+
+    // Auto-scroll to the bottom of the chat when new messages are added or the list is resized.
+    useEffect(() => {
+        itemCountRef.current = items.length;
+        scrollToEndIfAtBottom();
+    }, [messages, isTyping, items.length, size.height, scrollToEndIfAtBottom]);
+
+    const itemData = useMemo(() => ({ items, onListen, setRowHeight }), [items, onListen, setRowHeight]);
+
+    return (
+        <div className="flex flex-col flex-1 min-h-0">
+            {/* Button to page in archived history */}
+            {hasOlder && (
+                <div className="flex justify-center my-2">
+                    <button
+                        onClick={onShowOlder}
+                        className="px-4 py-1 rounded-full bg-gray-800 text-gray-300 hover:bg-gray-700 transition-colors text-sm disabled:opacity-50"
+                        disabled={isLoadingOlder}
+                    >
+                        Show older messages
+                    </button>
+                </div>
+            )}
+            {/* Virtualized messages */}
+            <div ref={containerRef} className="flex-1 min-h-0">
+                {isListMounted && (
+                    <BottomSentinelContext.Provider value={bottomRef}>
+                        <VariableSizeList
+                            ref={listRef}
+                            outerRef={outerRef}
+                            innerElementType={MessageListInner}
+                            height={size.height}
+                            width={size.width}
+                            itemCount={items.length}
+                            itemSize={getRowHeight}
+                            estimatedItemSize={ESTIMATED_ROW_HEIGHT}
+                            itemData={itemData}
+                            itemKey={getMessageKey}
+                            overscanCount={4}
+                        >
+                            {MessageRow}
+                        </VariableSizeList>
+                    </BottomSentinelContext.Provider>
+                )}
+            </div>
+            {/* Typing indicator */}
+            {isTyping && (
+                <div className="flex justify-start my-2">
+                    <div className="p-4 rounded-xl bg-gray-800 animate-pulse">
+                        ...
+                    </div>
+                </div>
+            )}
+        </div>
+    );
+});
+
+// Component for the message input form. Keeping the draft text and image
+// here means typing only re-renders the composer, not the conversation.
+const Composer = React.memo(function Composer({ onSend, onCreativePrompt, onClear, isTyping }) {
     // State for the user's current text input.
     const [input, setInput] = useState('');
     // State for the user's selected image file.
     const [image, setImage] = useState(null);
+    // Mirror of the selected image, so its preview can be revoked outside a render.
+    const imageRef = useRef(null);
+
+    // Function to replace the selected image. The old preview URL is revoked
+    // unless the image was sent, in which case the message now shows it.
+    const replaceImage = useCallback((next, revokePrevious) => {
+        if (revokePrevious && imageRef.current) URL.revokeObjectURL(imageRef.current.url);
+        imageRef.current = next;
+        setImage(next);
+    }, []);
+
+    // Revoke an unsent preview when the composer is unmounted.
+    useEffect(() => () => {
+        if (imageRef.current) URL.revokeObjectURL(imageRef.current.url);
+    }, []);
+
+    // Function to handle image file selection.
+    const handleImageChange = useCallback(async (e) => {
+        const file = e.target.files[0];
+        if (file) {
+            try {
+                replaceImage(await prepareImage(file), true);
+            } catch (error) {
+                console.error("Image processing failed:", error);
+            }
+        }
+    }, [replaceImage]);
+
+    // Function to discard the selected image before it is sent.
+    const handleRemoveImage = () => {
+        replaceImage(null, true);
+    };
+
+    // Function to hand the draft to the parent and reset the form.
+    const handleSubmit = (e) => {
+        e.preventDefault();
+        if ((!input.trim() && !image) || isTyping) return;
+        onSend(input, image);
+        setInput('');
+        replaceImage(null, false);
+    };
+
+    return (
+        <>
+            {/* Input Form */}
+            <form 
+                onSubmit={handleSubmit} 
+                className="flex items-center p-2 rounded-xl mt-4 bg-gray-800 border-2 border-transparent focus-within:border-blue-500 transition-colors"
+            >
+                {/* Image Upload Button */}
+                <label htmlFor="image-upload" className="cursor-pointer p-3 text-white hover:text-blue-400 transition-colors">
+                    <svg xmlns="http://www.w3.org/2000/svg" fill="none" viewBox="0 0 24 24" strokeWidth={1.5} stroke="currentColor" className="w-6 h-6">
+                        <path strokeLinecap="round" strokeLinejoin="round" d="M2.25 15.75L12 6L21.75 15.75M12 21L12 6M12 6L7.5 10.5M12 6L16.5 10.5" />
+                    </svg>
+                </label>
+                <input id="image-upload" type="file" accept="image/*" onChange={handleImageChange} className="hidden" />
+
+                {/* Creative Prompt Button */}
+                <button 
+                    type="button" 
+                    onClick={onCreativePrompt}
+                    className="p-3 text-white hover:text-blue-400 transition-colors disabled:opacity-50"
+                    title="Generate a creative response (e.g., recipe)"
+                    disabled={isTyping}
+                >
+                    <span role="img" aria-label="sparkles" className="text-2xl">✨</span>
+                </button>
+
+                {/* Clear Conversation Button */}
+                <button
+                    type="button"
+                    onClick={onClear}
+                    className="p-3 text-white hover:text-red-400 transition-colors disabled:text-gray-600"
+                    title="Clear the conversation"
+                    disabled={isTyping}
+                >
+                    <svg xmlns="http://www.w3.org/2000/svg" fill="none" viewBox="0 0 24 24" strokeWidth={1.5} stroke="currentColor" className="w-6 h-6">
+                        <path strokeLinecap="round" strokeLinejoin="round" d="M14.74 9l-.346 9m-4.788 0L9.26 9m9.968-3.21c.342.052.682.107 1.022.166m-1.022-.165L18.16 19.673a2.25 2.25 0 01-2.244 2.077H8.084a2.25 2.25 0 01-2.244-2.077L4.772 5.79m14.456 0a48.108 48.108 0 00-3.478-.397m-12 .562c.34-.059.68-.114 1.022-.165m0 0a48.11 48.11 0 013.478-.397m7.5 0v-.916c0-1.18-.91-2.164-2.09-2.201a51.964 51.964 0 00-3.32 0c-1.18.037-2.09 1.022-2.09 2.201v.916m7.5 0a48.667 48.667 0 00-7.5 0" />
+                    </svg>
+                </button>
+
+                <input
+                    type="text"
+                    value={input}
+                    onChange={(e) => setInput(e.target.value)}
+                    placeholder="Type your message..."
+                    className="flex-1 bg-transparent border-none outline-none text-white placeholder-gray-400 px-2 py-1"
+                    disabled={isTyping}
+                />
+                <button
+                    type="submit"
+                    className="ml-2 bg-blue-600 text-white p-3 rounded-full hover:bg-blue-700 transition-colors disabled:bg-gray-600"
+                    disabled={isTyping || (!input.trim() && !image)}
+                >
+                    <svg
+                        xmlns="http://www.w3.org/2000/svg"
+                        fill="none"
+                        viewBox="0 0 24 24"
+                        strokeWidth={1.5}
+                        stroke="currentColor"
+                        className="w-6 h-6"
+                    >
+                        <path
+                            strokeLinecap="round"
+                            strokeLinejoin="round"
+                            d="M6 12L3.269 3.126A59.768 59.768 0 0121.485 12 59.77 59.77 0 013.27 20.876L5.999 12zm0 0h7.5"
+                        />
+                    </svg>
+                </button>
+            </form>
+            {/* Image preview */}
+            {image && (
+                <div className="flex justify-center mt-4">
+                    <div className="relative w-32 h-32 rounded-lg overflow-hidden border-2 border-blue-500">
+                        <img src={image.url} alt="Preview" className="w-full h-full object-cover" />
+                        <button
+                            onClick={handleRemoveImage}
+                            className="absolute top-1 right-1 bg-red-500 text-white rounded-full p-1 leading-none"
+                        >
+                            <svg xmlns="http://www.w3.org/2000/svg" fill="none" viewBox="0 0 24 24" strokeWidth={2} stroke="currentColor" className="w-4 h-4">
+                                <path strokeLinecap="round" strokeLinejoin="round" d="M6 18L18 6M6 6l12 12" />
+                            </svg>
+                        </button>
+                    </div>
+                </div>
+            )}
+        </>
+    );
+});
+
+// Main component for the advanced Gemini-powered chatbot.
+export default function App() {
+    // State to hold the conversation history.
+    const [messages, setMessages] = useState([GREETING_MESSAGE]);
     // State to track if the model is currently generating a response.
     const [isTyping, setIsTyping] = useState(false);
-    // Reference to the chat container for auto-scrolling.
-    const chatContainerRef = useRef(null);
+    // Mirror of isTyping that handlers can read without depending on it.
+    const isTypingRef = useRef(false);
+    // State to track whether the saved conversation has been loaded.
+    const [isHydrated, setIsHydrated] = useState(false);
+    // Number of message pages moved to the IndexedDB archive.
+    const [archivedPages, setArchivedPages] = useState(0);
+    // Archived messages paged back in for display, and how many pages that covers.
+    const [olderMessages, setOlderMessages] = useState([]);
+    const [loadedOlderPages, setLoadedOlderPages] = useState(0);
+    // Mirror of the two page counts, for handlers that need them after an await.
+    const olderPagesRef = useRef({ archived: 0, loaded: 0 });
+    // State to track whether an archived page is being loaded, and its mirror.
+    const [isLoadingOlder, setIsLoadingOlder] = useState(false);
+    const isLoadingOlderRef = useRef(false);
     // Reference to the audio element for TTS playback.
     const audioRef = useRef(null);
+    // Web Audio context and the clip currently playing through it.
+    const audioContextRef = useRef(null);
+    const audioSourceRef = useRef(null);
+    // Cache of synthesized audio (message text -> AudioBuffer, or WAV object URL
+    // without Web Audio) so replays skip the TTS call. Kept in least recently
+    // played order, up to TTS_CACHE_SIZE clips.
+    const ttsCacheRef = useRef(new Map());
+    // TTS requests still in flight, by message text.
+    const ttsRequestsRef = useRef(new Map());
+    // The conversation shaped for the API, kept in step with `messages` so
+    // requests don't have to rebuild it.
+    const apiHistoryRef = useRef([toApiContent(GREETING_MESSAGE)]);
+    // The most recent image turn's history entry and image data, re-attached to requests.
+    const lastImageTurnRef = useRef(null);
+    // Object URLs of the images currently shown, so they can be revoked once they're not.
+    const imageUrlsRef = useRef(new Set());
+    // Streamed text not yet rendered, and the animation frame scheduled to render it.
+    const pendingTextRef = useRef('');
+    const streamFrameRef = useRef(0);
+
+    // Release the cached TTS audio when the chat is unmounted.
+    useEffect(() => {
+        const ttsCache = ttsCacheRef.current;
+        return () => {
+            ttsCache.forEach(releaseClip);
+            ttsCache.clear();
+            audioContextRef.current?.close();
+            audioContextRef.current = null;
+        };
+    }, []);
 
-    // Gemini API configuration
-    const apiKey = "";
-    const flashApiUrl = `https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-preview-05-20:generateContent?key=${apiKey}`;
-    const ttsApiUrl = `https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-preview-tts:generateContent?key=${apiKey}`;
-
-    // Helper functions for TTS audio conversion (from PCM to WAV)
-    function base64ToArrayBuffer(base64) {
-        const binaryString = window.atob(base64);
-        const len = binaryString.length;
-        const bytes = new Uint8Array(len);
-        for (let i = 0; i < len; i++) {
-            bytes[i] = binaryString.charCodeAt(i);
+    // Function to play a synthesized clip, replacing whatever is already playing.
+    const playClip = useCallback((clip) => {
+        if (typeof clip === 'string') {
+            playAudio(audioRef.current, clip);
+            return;
         }
-        return bytes.buffer;
-    }
+        const ctx = audioContextRef.current;
+        audioSourceRef.current?.stop();
+        const source = ctx.createBufferSource();
+        source.buffer = clip;
+        source.connect(ctx.destination);
+        source.start();
+        audioSourceRef.current = source;
+    }, []);
+
+    // Restore the saved conversation, keeping anything sent while it was loading.
+    useEffect(() => {
+        let cancelled = false;
+        Promise.all([idbGet('messages'), idbGet('archivePages')])
+            .then(([stored, pages]) => {
+                if (cancelled) return;
+                if (pages) setArchivedPages(pages);
+                if (stored) {
+                    // Restore outside the updater, which may run twice and would leak the first call's object URLs.
+                    const restored = stored.map(fromStoredMessage);
+                    setMessages(prev => [...restored, ...prev.slice(1)]);
+                    apiHistoryRef.current = [...stored.map(toApiContent), ...apiHistoryRef.current.slice(1)];
+                }
+            })
+            .catch(error => console.error("Failed to load chat history:", error))
+            .finally(() => {
+                if (!cancelled) setIsHydrated(true);
+            });
+        return () => {
+            cancelled = true;
+        };
+    }, []);
+
+    // Persist the conversation once it has settled, rather than on every streamed chunk.
+    useEffect(() => {
+        if (!isHydrated) return;
+        const handle = setTimeout(() => {
+            idbSet('messages', messages.map(toStoredMessage))
+                .catch(error => console.error("Failed to save chat history:", error));
+        }, PERSIST_DELAY_MS);
+        return () => clearTimeout(handle);
+    }, [messages, isHydrated]);
 
-    function pcmToWav(pcm16, sampleRate) {
-        const numSamples = pcm16.length;
-        const numChannels = 1;
-        const sampleRateHz = sampleRate;
-        const bitDepth = 16;
-        const format = 1; // PCM
-        const byteRate = sampleRateHz * numChannels * bitDepth / 8;
-        const blockAlign = numChannels * bitDepth / 8;
-        const dataSize = numSamples * numChannels * bitDepth / 8;
-        const buffer = new ArrayBuffer(44 + dataSize);
-        const view = new DataView(buffer);
-
-        // RIFF header
-        writeString(view, 0, 'RIFF');
-        view.setUint32(4, 36 + dataSize, true);
-        writeString(view, 8, 'WAVE');
-
-        // fmt chunk
-        writeString(view, 12, 'fmt ');
-        view.setUint32(16, 16, true);
-        view.setUint16(20, format, true);
-        view.setUint16(22, numChannels, true);
-        view.setUint32(24, sampleRateHz, true);
-        view.setUint32(28, byteRate, true);
-        view.setUint16(32, blockAlign, true);
-        view.setUint16(34, bitDepth, true);
-
-        // data chunk
-        writeString(view, 36, 'data');
-        view.setUint32(40, dataSize, true);
-        let offset = 44;
-        for (let i = 0; i < numSamples; i++) {
-            view.setInt16(offset, pcm16[i], true);
-            offset += 2;
+    // Keep the live conversation bounded by moving the oldest page of messages
+    // into the archive once it grows past MAX_MESSAGES.
+    useEffect(() => {
+        if (!isHydrated || messages.length <= MAX_MESSAGES) return;
+        const overflow = messages.slice(0, ARCHIVE_PAGE_SIZE);
+        const page = archivedPages;
+        // Save the trimmed conversation alongside the archive page, so a reload
+        // can't restore the archived messages a second time.
+        idbSetMany([
+            [`archive-${page}`, overflow.map(toStoredMessage)],
+            ['archivePages', page + 1],
+            ['messages', messages.slice(overflow.length).map(toStoredMessage)]
+        ]).catch(error => console.error("Failed to archive messages:", error));
+        setArchivedPages(page + 1);
+        setMessages(prev => prev.slice(overflow.length));
+        const removed = apiHistoryRef.current.splice(0, overflow.length);
+        if (lastImageTurnRef.current && removed.includes(lastImageTurnRef.current.content)) {
+            lastImageTurnRef.current = null;
         }
-        return new Blob([view], { type: 'audio/wav' });
-    }
+        // Keep any paged-in history contiguous with the live conversation.
+        if (loadedOlderPages > 0) {
+            setOlderMessages(prev => [...prev, ...overflow]);
+            setLoadedOlderPages(count => count + 1);
+        }
+    }, [messages, isHydrated, archivedPages, loadedOlderPages]);
 
-    function writeString(view, offset, string) {
-        for (let i = 0; i < string.length; i++) {
-            view.setUint8(offset + i, string.charCodeAt(i));
+    // Revoke the object URLs of image messages that are no longer shown,
+    // whether they were archived or cleared.
+    useEffect(() => {
+        const urls = new Set();
+        for (const list of [olderMessages, messages]) {
+            for (const msg of list) {
+                if (msg.image?.url) urls.add(msg.image.url);
+            }
         }
-    }
+        imageUrlsRef.current.forEach(url => {
+            if (!urls.has(url)) URL.revokeObjectURL(url);
+        });
+        imageUrlsRef.current = urls;
+    }, [messages, olderMessages]);
+
+    // Function to update the typing state and its ref together.
+    const setTyping = useCallback((value) => {
+        isTypingRef.current = value;
+        setIsTyping(value);
+    }, []);
 
-    // Auto-scroll to the bottom of the chat when new messages are added.
+    // Function to add a message to the end of the conversation. Returns the
+    // message's API history entry.
+    const appendMessage = useCallback((message) => {
+        const content = toApiContent(message);
+        apiHistoryRef.current.push(content);
+        if (message.image?.data) {
+            lastImageTurnRef.current = {
+                content,
+                inlineData: { mimeType: message.image.mimeType, data: message.image.data }
+            };
+        }
+        setMessages(prev => [...prev, { ...message, id: crypto.randomUUID() }]);
+        return content;
+    }, []);
+
+    // Function to copy the API history for a request, re-attaching the most recent
+    // image so follow-up questions about it can still be answered.
+    const getApiContents = useCallback(() => {
+        const contents = [...apiHistoryRef.current];
+        const latest = lastImageTurnRef.current;
+        if (latest) {
+            const index = contents.lastIndexOf(latest.content);
+            if (index !== -1) {
+                contents[index] = {
+                    role: latest.content.role,
+                    parts: [latest.content.parts[0], { inlineData: latest.inlineData }]
+                };
+            }
+        }
+        return contents;
+    }, []);
+
+    // Function to move buffered streamed text into the last message in a single update.
+    const flushStreamedText = useCallback(() => {
+        if (streamFrameRef.current) cancelAnimationFrame(streamFrameRef.current);
+        streamFrameRef.current = 0;
+        const toAppend = pendingTextRef.current;
+        if (!toAppend) return;
+        pendingTextRef.current = '';
+        setMessages(prev => {
+            const copy = [...prev];
+            const last = copy[copy.length - 1];
+            copy[copy.length - 1] = { ...last, content: last.content + toAppend };
+            return copy;
+        });
+    }, []);
+
+    // Function to buffer streamed text, flushing it at most once per animation frame.
+    const appendStreamedText = useCallback((delta) => {
+        pendingTextRef.current += delta;
+        if (!streamFrameRef.current) streamFrameRef.current = requestAnimationFrame(flushStreamedText);
+    }, [flushStreamedText]);
+
+    // Drop any pending flush when the chat is unmounted.
+    useEffect(() => () => cancelAnimationFrame(streamFrameRef.current), []);
+
+    // Keep the page-count mirror in step with state.
     useEffect(() => {
-        if (chatContainerRef.current) {
-            chatContainerRef.current.scrollTop = chatContainerRef.current.scrollHeight;
+        olderPagesRef.current = { archived: archivedPages, loaded: loadedOlderPages };
+    }, [archivedPages, loadedOlderPages]);
+
+    // Function to update the loading-older state and its ref together.
+    const setLoadingOlder = useCallback((value) => {
+        isLoadingOlderRef.current = value;
+        setIsLoadingOlder(value);
+    }, []);
+
+    // Function to page the next-older block of archived messages back into view.
+    // One page loads at a time, so quick repeat clicks can't load the same page twice.
+    const handleShowOlder = useCallback(async () => {
+        if (isLoadingOlderRef.current) return;
+        const nextOlderPage = () => olderPagesRef.current.archived - olderPagesRef.current.loaded - 1;
+        const page = nextOlderPage();
+        if (page < 0) return;
+        setLoadingOlder(true);
+        try {
+            const stored = await idbGet(`archive-${page}`);
+            // Drop the page if archiving or a cleared chat moved the next-older page while it loaded.
+            if (page === nextOlderPage()) {
+                const restored = (stored || []).map(fromStoredMessage);
+                setOlderMessages(prev => [...restored, ...prev]);
+                setLoadedOlderPages(count => count + 1);
+            }
+        } catch (error) {
+            console.error("Failed to load older messages:", error);
+        } finally {
+            setLoadingOlder(false);
         }
-    }, [messages, isTyping]);
+    }, [setLoadingOlder]);
+
+    // Function to start a new conversation and forget the saved one.
+    const handleClearChat = useCallback(() => {
+        setMessages([GREETING_MESSAGE]);
+        apiHistoryRef.current = [toApiContent(GREETING_MESSAGE)];
+        lastImageTurnRef.current = null;
+        setOlderMessages([]);
+        setLoadedOlderPages(0);
+        setArchivedPages(0);
+        ttsCacheRef.current.forEach(releaseClip);
+        ttsCacheRef.current.clear();
+        const keys = ['messages', 'archivePages'];
+        for (let page = 0; page < archivedPages; page++) keys.push(`archive-${page}`);
+        Promise.all(keys.map(idbDel)).catch(error => console.error("Failed to clear chat history:", error));
+    }, [archivedPages]);
 
     // Function to handle TTS and play audio.
-    const handleListen = async (text) => {
+    const handleListen = useCallback(async (text) => {
         try {
-            const payload = {
-                contents: [{ parts: [{ text: text }] }],
-                generationConfig: {
-                    responseModalities: ["AUDIO"],
-                    speechConfig: { voiceConfig: { prebuiltVoiceConfig: { voiceName: "Zephyr" } } }
-                },
-                model: "gemini-2.5-flash-preview-tts"
-            };
-            const response = await fetch(ttsApiUrl, {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify(payload)
-            });
-
-            if (!response.ok) throw new Error(`API Error: ${response.statusText}`);
-            const result = await response.json();
-            const part = result?.candidates?.[0]?.content?.parts?.[0];
-            const audioData = part?.inlineData?.data;
-            if (audioData) {
-                const sampleRate = 16000; // The sample rate for Gemini TTS model
-                const pcmData = base64ToArrayBuffer(audioData);
-                const pcm16 = new Int16Array(pcmData);
-                const wavBlob = pcmToWav(pcm16, sampleRate);
-                const audioUrl = URL.createObjectURL(wavBlob);
-                if (audioRef.current) {
-                    audioRef.current.src = audioUrl;
-                    audioRef.current.play().catch(e => console.error("Autoplay failed:", e));
+            // Create or resume the audio context while still inside the click that started playback.
+            if (AudioContextClass && !audioContextRef.current) {
+                try {
+                    audioContextRef.current = new AudioContextClass();
+                } catch (error) {
+                    // Without a context (e.g. no audio hardware), play a WAV through the <audio> element.
+                    console.error("Audio context unavailable:", error);
                 }
             }
+            audioContextRef.current?.resume().catch(error => console.error("Audio resume failed:", error));
+            const ttsCache = ttsCacheRef.current;
+            const cachedClip = ttsCache.get(text);
+            if (cachedClip) {
+                // Move the clip to the most recently played end.
+                ttsCache.delete(text);
+                ttsCache.set(text, cachedClip);
+                playClip(cachedClip);
+                return;
+            }
+            // Clicks on a message whose audio is still being fetched share that request.
+            const requests = ttsRequestsRef.current;
+            let request = requests.get(text);
+            if (!request) {
+                request = synthesizeSpeech(text, audioContextRef.current)
+                    .then(clip => {
+                        if (clip) {
+                            ttsCache.set(text, clip);
+                            if (ttsCache.size > TTS_CACHE_SIZE) {
+                                const oldest = ttsCache.keys().next().value;
+                                releaseClip(ttsCache.get(oldest));
+                                ttsCache.delete(oldest);
+                            }
+                        }
+                        return clip;
+                    })
+                    .finally(() => requests.delete(text));
+                requests.set(text, request);
+            }
+            const clip = await request;
+            if (clip) playClip(clip);
         } catch (error) {
             console.error("TTS failed:", error);
         }
-    };
+    }, [playClip]);
 
     // Function to handle the creative content generation (e.g., recipe).
-    const handleCreativePrompt = async () => {
-        setIsTyping(true);
+    const handleCreativePrompt = useCallback(async () => {
+        if (isTypingRef.current) return;
+        setTyping(true);
         const userMessage = { role: 'user', content: "Please provide a recipe based on the conversation history.", type: 'text' };
-        setMessages(prev => [...prev, userMessage]);
-
-        // Construct chat history with only text content for the LLM
-        const chatHistory = messages.filter(msg => msg.type === 'text').map(msg => ({
-            role: msg.role === 'model' ? 'model' : 'user',
-            parts: [{ text: msg.content }]
-        }));
+        appendMessage(userMessage);
 
         const payload = {
-            contents: chatHistory,
+            contents: getApiContents(),
             generationConfig: {
                 responseMimeType: "application/json",
                 responseSchema: {
@@ -150,7 +992,7 @@ export default function App() {
         };
 
         try {
-            const response = await fetch(flashApiUrl, {
+            const response = await fetch(FLASH_API_URL, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify(payload)
@@ -161,51 +1003,23 @@ export default function App() {
             const jsonText = result.candidates[0].content.parts[0].text;
             const recipe = JSON.parse(jsonText);
 
-            setMessages(prevMessages => [
-                ...prevMessages,
-                { role: 'model', content: recipe, type: 'recipe' }
-            ]);
+            appendMessage({ role: 'model', content: recipe, type: 'recipe' });
 
         } catch (error) {
             console.error("Error generating recipe:", error);
-            setMessages(prevMessages => [
-                ...prevMessages,
-                { role: 'model', content: "Sorry, I couldn't generate a recipe. Please try again.", type: 'text' }
-            ]);
+            appendMessage({ role: 'model', content: "Sorry, I couldn't generate a recipe. Please try again.", type: 'text' });
         } finally {
-            setIsTyping(false);
+            setTyping(false);
         }
-    };
+    }, [appendMessage, getApiContents, setTyping]);
 
     // Function to handle sending a message.
-    const handleSendMessage = async (e) => {
-        e.preventDefault();
-        if ((!input.trim() && !image) || isTyping) return;
-
-        // Add user message to history
-        const userMessage = { role: 'user', content: input, type: 'text', image: image };
-        setMessages(prev => [...prev, userMessage]);
-        setInput('');
-        setImage(null);
-        setIsTyping(true);
-
-        const chatHistory = messages.map(msg => {
-            const parts = [{ text: msg.content }];
-            if (msg.image) {
-                parts.push({
-                    inlineData: {
-                        mimeType: msg.image.mimeType,
-                        data: msg.image.data
-                    }
-                });
-            }
-            return {
-                role: msg.role === 'model' ? 'model' : 'user',
-                parts
-            };
-        });
+    const handleSendMessage = useCallback(async (input, image) => {
+        if ((!input.trim() && !image) || isTypingRef.current) return;
 
-        // Add the new user message with potential image to the payload
+        // Add the new user message with potential image to the payload. A new image
+        // supersedes the previous one, so older images stay as placeholders.
+        const history = image ? [...apiHistoryRef.current] : getApiContents();
         const userParts = [{ text: input }];
         if (image) {
             userParts.push({
@@ -216,199 +1030,64 @@ export default function App() {
             });
         }
         const payload = {
-            contents: [...chatHistory, { role: 'user', parts: userParts }],
+            contents: [...history, { role: 'user', parts: userParts }],
             generationConfig: {
                 responseMimeType: "text/plain",
             }
         };
 
+        // Add user message to history
+        const userMessage = { role: 'user', content: input, type: 'text', image: image };
+        appendMessage(userMessage);
+        setTyping(true);
+
         try {
-            const response = await fetch(flashApiUrl, {
+            const response = await fetch(FLASH_STREAM_API_URL, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify(payload)
             });
 
             if (!response.ok) throw new Error(`API call failed with status: ${response.status}`);
-            const result = await response.json();
-            const modelResponse = result.candidates[0].content.parts[0].text;
 
-            setMessages(prevMessages => [
-                ...prevMessages,
-                { role: 'model', content: modelResponse, type: 'text' }
-            ]);
+            // Append streamed text to the model's reply as it arrives.
+            let reply = null;
+            for await (const chunk of readSseEvents(response)) {
+                const delta = chunk?.candidates?.[0]?.content?.parts?.[0]?.text;
+                if (!delta) continue;
+                if (!reply) {
+                    reply = appendMessage({ role: 'model', content: delta, type: 'text' });
+                } else {
+                    reply.parts[0].text += delta;
+                    appendStreamedText(delta);
+                }
+            }
+            flushStreamedText();
+            if (!reply) throw new Error("API returned an empty response");
         } catch (error) {
+            flushStreamedText();
             console.error("Error fetching from Gemini API:", error);
-            setMessages(prevMessages => [
-                ...prevMessages,
-                { role: 'model', content: "Sorry, I'm having trouble connecting right now. Please try again later.", type: 'text' }
-            ]);
+            appendMessage({ role: 'model', content: "Sorry, I'm having trouble connecting right now. Please try again later.", type: 'text' });
         } finally {
-            setIsTyping(false);
+            setTyping(false);
         }
-    };
-
-    // Function to handle image file selection.
-    const handleImageChange = (e) => {
-        const file = e.target.files[0];
-        if (file) {
-            const reader = new FileReader();
-            reader.onloadend = () => {
-                const base64Data = reader.result.split(',')[1];
-                setImage({
-                    data: base64Data,
-                    mimeType: file.type,
-                    url: reader.result
-                });
-            };
-            reader.readAsDataURL(file);
-        }
-    };
-
-    // Component to render a recipe card.
-    const RecipeCard = ({ recipe }) => (
-        <div className="bg-gray-700 p-4 rounded-xl shadow-lg mt-2">
-            <h3 className="text-xl font-bold mb-2 text-white">{recipe.recipeName}</h3>
-            <h4 className="font-semibold text-gray-300">Ingredients:</h4>
-            <ul className="list-disc list-inside text-gray-400 mb-2">
-                {recipe.ingredients.map((item, i) => (
-                    <li key={i}>{item}</li>
-                ))}
-            </ul>
-            <h4 className="font-semibold text-gray-300">Instructions:</h4>
-            <ol className="list-decimal list-inside text-gray-400">
-                {recipe.instructions.map((step, i) => (
-                    <li key={i}>{step}</li>
-                ))}
-            </ol>
-        </div>
-    );
+    }, [appendMessage, getApiContents, appendStreamedText, flushStreamedText, setTyping]);
 
     return (
         <div className="flex flex-col h-screen bg-gray-900 text-white font-sans antialiased">
             <audio ref={audioRef} className="hidden"></audio>
             {/* Main Chat Container */}
             <div className="flex flex-col flex-1 max-w-4xl mx-auto w-full p-4 overflow-hidden">
-                <div 
-                    ref={chatContainerRef}
-                    className="flex-1 overflow-y-auto pr-2"
-                >
-                    {/* Map through and display messages */}
-                    {messages.map((msg, index) => (
-                        <div
-                            key={index}
-                            className={`flex my-2 ${msg.role === 'user' ? 'justify-end' : 'justify-start'}`}
-                        >
-                            {msg.role === 'user' ? (
-                                <div className="flex flex-col items-end">
-                                    <div className="p-4 rounded-xl max-w-3/4 shadow-lg bg-blue-600 rounded-br-none">
-                                        {msg.content}
-                                    </div>
-                                    {msg.image && (
-                                        <div className="mt-2 w-48 h-auto overflow-hidden rounded-lg shadow-md">
-                                            <img src={msg.image.url} alt="User upload" className="w-full h-full object-cover" />
-                                        </div>
-                                    )}
-                                </div>
-                            ) : (
-                                <div className="flex flex-col items-start">
-                                    {msg.type === 'text' && (
-                                        <div className="p-4 rounded-xl max-w-3/4 shadow-lg bg-gray-800 rounded-bl-none flex items-center">
-                                            <span>{msg.content}</span>
-                                            <button 
-                                                onClick={() => handleListen(msg.content)} 
-                                                className="ml-4 p-2 rounded-full bg-gray-700 hover:bg-gray-600 transition-colors"
-                                                title="Listen to this message"
-                                            >
-                                                <svg xmlns="http://www.w3.org/2000/svg" fill="currentColor" viewBox="0 0 24 24" className="w-5 h-5">
-                                                    <path d="M3 9v6h4l5 5V4L7 9H3zm13.5 3c0-1.77-1-3.22-2.5-4v8c1.5-.78 2.5-2.23 2.5-4zM16 1.84v2.02c4.42 1.49 7 5.09 7 9.14s-2.58 7.65-7 9.14v2.02c5.52-1.55 9-6.31 9-11.16s-3.48-9.61-9-11.16z" />
-                                                </svg>
-                                            </button>
-                                        </div>
-                                    )}
-                                    {msg.type === 'recipe' && <RecipeCard recipe={msg.content} />}
-                                </div>
-                            )}
-                        </div>
-                    ))}
-                    {/* Typing indicator */}
-                    {isTyping && (
-                        <div className="flex justify-start my-2">
-                            <div className="p-4 rounded-xl bg-gray-800 animate-pulse">
-                                ...
-                            </div>
-                        </div>
-                    )}
-                </div>
-
-                {/* Input Form */}
-                <form 
-                    onSubmit={handleSendMessage} 
-                    className="flex items-center p-2 rounded-xl mt-4 bg-gray-800 border-2 border-transparent focus-within:border-blue-500 transition-colors"
-                >
-                    {/* Image Upload Button */}
-                    <label htmlFor="image-upload" className="cursor-pointer p-3 text-white hover:text-blue-400 transition-colors">
-                        <svg xmlns="http://www.w3.org/2000/svg" fill="none" viewBox="0 0 24 24" strokeWidth={1.5} stroke="currentColor" className="w-6 h-6">
-                            <path strokeLinecap="round" strokeLinejoin="round" d="M2.25 15.75L12 6L21.75 15.75M12 21L12 6M12 6L7.5 10.5M12 6L16.5 10.5" />
-                        </svg>
-                    </label>
-                    <input id="image-upload" type="file" accept="image/*" onChange={handleImageChange} className="hidden" />
-
-                    {/* Creative Prompt Button */}
-                    <button 
-                        type="button" 
-                        onClick={handleCreativePrompt}
-                        className="p-3 text-white hover:text-blue-400 transition-colors"
-                        title="Generate a creative response (e.g., recipe)"
-                    >
-                        <span role="img" aria-label="sparkles" className="text-2xl">✨</span>
-                    </button>
-
-                    <input
-                        type="text"
-                        value={input}
-                        onChange={(e) => setInput(e.target.value)}
-                        placeholder="Type your message..."
-                        className="flex-1 bg-transparent border-none outline-none text-white placeholder-gray-400 px-2 py-1"
-                        disabled={isTyping}
-                    />
-                    <button
-                        type="submit"
-                        className="ml-2 bg-blue-600 text-white p-3 rounded-full hover:bg-blue-700 transition-colors disabled:bg-gray-600"
-                        disabled={isTyping || (!input.trim() && !image)}
-                    >
-                        <svg
-                            xmlns="http://www.w3.org/2000/svg"
-                            fill="none"
-                            viewBox="0 0 24 24"
-                            strokeWidth={1.5}
-                            stroke="currentColor"
-                            className="w-6 h-6"
-                        >
-                            <path
-                                strokeLinecap="round"
-                                strokeLinejoin="round"
-                                d="M6 12L3.269 3.126A59.768 59.768 0 0121.485 12 59.77 59.77 0 013.27 20.876L5.999 12zm0 0h7.5"
-                            />
-                        </svg>
-                    </button>
-                </form>
-                {/* Image preview */}
-                {image && (
-                    <div className="flex justify-center mt-4">
-                        <div className="relative w-32 h-32 rounded-lg overflow-hidden border-2 border-blue-500">
-                            <img src={image.url} alt="Preview" className="w-full h-full object-cover" />
-                            <button
-                                onClick={() => setImage(null)}
-                                className="absolute top-1 right-1 bg-red-500 text-white rounded-full p-1 leading-none"
-                            >
-                                <svg xmlns="http://www.w3.org/2000/svg" fill="none" viewBox="0 0 24 24" strokeWidth={2} stroke="currentColor" className="w-4 h-4">
-                                    <path strokeLinecap="round" strokeLinejoin="round" d="M6 18L18 6M6 6l12 12" />
-                                </svg>
-                            </button>
-                        </div>
-                    </div>
-                )}
+                <MessageList
+                    messages={messages}
+                    olderMessages={olderMessages}
+                    hasOlder={loadedOlderPages < archivedPages}
+                    isLoadingOlder={isLoadingOlder}
+                    onShowOlder={handleShowOlder}
+                    isTyping={isTyping}
+                    onListen={handleListen}
+                />
+                <Composer onSend={handleSendMessage} onCreativePrompt={handleCreativePrompt} onClear={handleClearChat} isTyping={isTyping} />
             </div>
         </div>
     );
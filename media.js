@@ -0,0 +1,155 @@
+// Image and audio helpers shared by the media worker and its main-thread fallback.
+
+// Typed arrays use the platform byte order, while the TTS PCM is little-endian.
+const IS_LITTLE_ENDIAN = new Uint16Array(new Uint8Array([1, 0]).buffer)[0] === 1;
+
+// Sample rate of the PCM audio returned by the Gemini TTS model.
+const TTS_SAMPLE_RATE = 16000;
+
+// Helper to build the 44-byte header of a mono 16-bit PCM WAV file. The two
+// size fields (offsets 4 and 40) are left zero for the caller to fill in.
+function buildWavHeader(sampleRate) {
+    const numChannels = 1;
+    const bitDepth = 16;
+    const format = 1; // PCM
+    const byteRate = sampleRate * numChannels * bitDepth / 8;
+    const blockAlign = numChannels * bitDepth / 8;
+    const header = new Uint8Array(44);
+    const view = new DataView(header.buffer);
+
+    // RIFF header
+    writeString(view, 0, 'RIFF');
+    writeString(view, 8, 'WAVE');
+
+    // fmt chunk
+    writeString(view, 12, 'fmt ');
+    view.setUint32(16, 16, true);
+    view.setUint16(20, format, true);
+    view.setUint16(22, numChannels, true);
+    view.setUint32(24, sampleRate, true);
+    view.setUint32(28, byteRate, true);
+    view.setUint16(32, blockAlign, true);
+    view.setUint16(34, bitDepth, true);
+
+    // data chunk
+    writeString(view, 36, 'data');
+    return header;
+}
+
+function writeString(view, offset, string) {
+    for (let i = 0; i < string.length; i++) {
+        view.setUint8(offset + i, string.charCodeAt(i));
+    }
+}
+
+// Header for TTS audio, built once and copied into every WAV file.
+const WAV_HEADER_TEMPLATE = buildWavHeader(TTS_SAMPLE_RATE);
+
+// Largest the reused pcmToWav scratch buffer may grow; bigger clips get a
+// buffer of their own that is freed with the call.
+const MAX_WAV_SCRATCH_BYTES = 1024 * 1024;
+
+// Scratch buffer reused across pcmToWav calls, grown to the next power of two
+// (up to MAX_WAV_SCRATCH_BYTES) when a clip doesn't fit.
+let wavScratch = new Uint8Array(64 * 1024);
+
+// Helper function for TTS audio conversion (from PCM to a WAV Blob).
+// Gemini returns little-endian 16-bit PCM, which is already the WAV data chunk
+// byte for byte, so the samples are copied over without being reinterpreted.
+export function pcmToWav(pcmBuffer, sampleRate) {
+    const dataSize = pcmBuffer.byteLength;
+    const size = 44 + dataSize;
+    if (size > MAX_WAV_SCRATCH_BYTES) {
+        return new Blob([fillWav(new Uint8Array(size), pcmBuffer, sampleRate)], { type: 'audio/wav' });
+    }
+    if (wavScratch.byteLength < size) {
+        wavScratch = new Uint8Array(2 ** Math.ceil(Math.log2(size)));
+    }
+    // The Blob takes its own copy of the bytes, leaving the scratch buffer free for the next call.
+    return new Blob([fillWav(wavScratch.subarray(0, size), pcmBuffer, sampleRate)], { type: 'audio/wav' });
+}
+
+// Helper to write the WAV header and PCM data into `out`, sized to fit both exactly.
+function fillWav(out, pcmBuffer, sampleRate) {
+    const dataSize = pcmBuffer.byteLength;
+    out.set(sampleRate === TTS_SAMPLE_RATE ? WAV_HEADER_TEMPLATE : buildWavHeader(sampleRate));
+    const view = new DataView(out.buffer);
+    view.setUint32(4, 36 + dataSize, true);
+    view.setUint32(40, dataSize, true);
+    out.set(new Uint8Array(pcmBuffer), 44);
+    return out;
+}
+
+// Helper to convert 16-bit PCM bytes to the [-1, 1) float samples Web Audio plays.
+export function pcmToFloat32(pcmBuffer) {
+    const numSamples = pcmBuffer.byteLength >> 1;
+    const samples = new Float32Array(numSamples);
+    if (IS_LITTLE_ENDIAN) {
+        const pcm16 = new Int16Array(pcmBuffer, 0, numSamples);
+        for (let i = 0; i < numSamples; i++) {
+            samples[i] = pcm16[i] / 32768;
+        }
+    } else {
+        const view = new DataView(pcmBuffer);
+        for (let i = 0; i < numSamples; i++) {
+            samples[i] = view.getInt16(i * 2, true) / 32768;
+        }
+    }
+    return samples;
+}
+
+// Longest edge, in pixels, of images sent to Gemini.
+const MAX_IMAGE_DIMENSION = 1024;
+
+// Helper to read a Blob as a data URL and return just its base64 payload.
+function readAsBase64(blob) {
+    return new Promise((resolve, reject) => {
+        const reader = new FileReader();
+        reader.onloadend = () => resolve(reader.result.split(',')[1]);
+        reader.onerror = () => reject(reader.error);
+        reader.readAsDataURL(blob);
+    });
+}
+
+// Helper to create a canvas, using OffscreenCanvas where there is one and a
+// <canvas> element otherwise.
+function createCanvas(width, height) {
+    if (typeof OffscreenCanvas !== 'undefined') return new OffscreenCanvas(width, height);
+    if (typeof document === 'undefined') throw new Error("No canvas is available to encode the image");
+    const canvas = document.createElement('canvas');
+    canvas.width = width;
+    canvas.height = height;
+    return canvas;
+}
+
+// Helper to encode a canvas as a JPEG Blob.
+function canvasToJpeg(canvas) {
+    if (canvas.convertToBlob) return canvas.convertToBlob({ type: 'image/jpeg', quality: 0.85 });
+    return new Promise(resolve => canvas.toBlob(resolve, 'image/jpeg', 0.85));
+}
+
+// Helper to downscale an image file to at most MAX_IMAGE_DIMENSION and base64 encode it.
+// Formats the browser can't decode (e.g. HEIC) are sent as-is for Gemini to read.
+export async function encodeImage(file) {
+    const bitmap = typeof createImageBitmap === 'function' ? await createImageBitmap(file).catch(() => null) : null;
+    const scale = bitmap ? Math.min(1, MAX_IMAGE_DIMENSION / Math.max(bitmap.width, bitmap.height)) : 1;
+    if (scale === 1) {
+        bitmap?.close();
+        return { data: await readAsBase64(file), mimeType: file.type };
+    }
+
+    const width = Math.round(bitmap.width * scale);
+    const height = Math.round(bitmap.height * scale);
+    let canvas;
+    try {
+        canvas = createCanvas(width, height);
+        const ctx = canvas.getContext('2d');
+        // JPEG has no alpha channel, so draw onto a white background.
+        ctx.fillStyle = '#fff';
+        ctx.fillRect(0, 0, width, height);
+        ctx.drawImage(bitmap, 0, 0, width, height);
+    } finally {
+        bitmap.close();
+    }
+    return { data: await readAsBase64(await canvasToJpeg(canvas)), mimeType: 'image/jpeg' };
+}
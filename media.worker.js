@@ -0,0 +1,30 @@
+// Dedicated worker for media encoding, keeping image and audio work off the UI thread.
+
+import { encodeImage, pcmToWav, pcmToFloat32 } from './media.js';
+
+// Handle a job from the page and reply with its result (or error) under the same id.
+self.onmessage = async ({ data: job }) => {
+    try {
+        switch (job.type) {
+            case 'encodeImage': {
+                const result = await encodeImage(job.file);
+                self.postMessage({ id: job.id, result });
+                break;
+            }
+            case 'pcmToWav': {
+                const wavBlob = pcmToWav(job.pcmBuffer, job.sampleRate);
+                self.postMessage({ id: job.id, result: wavBlob });
+                break;
+            }
+            case 'pcmToFloat32': {
+                const samples = pcmToFloat32(job.pcmBuffer);
+                self.postMessage({ id: job.id, result: samples }, [samples.buffer]);
+                break;
+            }
+            default:
+                throw new Error(`Unknown job type: ${job.type}`);
+        }
+    } catch (error) {
+        self.postMessage({ id: job.id, error: error.message });
+    }
+};